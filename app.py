@@ -2,6 +2,10 @@
 """
 Fruit Search Bot - Flask Backend
 Required packages: pip install Flask Flask-Cors pyautogui
+Optional (ASGI serving): pip install a2wsgi uvicorn
+Optional (threaded WSGI serving): pip install waitress
+Optional (CDP automation mode): pip install playwright
+Optional (faster JSON): pip install orjson ijson
 
 This application provides a web interface for automated browser searching
 with support for multiple browsers and Chrome profiles.
@@ -11,17 +15,22 @@ import json
 import os
 import platform
 import random
+import shutil
 import subprocess
 import sys
 import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Dict, List, Optional, Any
+from urllib.parse import quote_plus
 import argparse
+import asyncio
 
 # Core imports
 try:
     from flask import Flask, jsonify, request, send_from_directory
+    from flask.json.provider import DefaultJSONProvider
     from flask_cors import CORS
     import pyautogui
 except ImportError as e:
@@ -29,18 +38,175 @@ except ImportError as e:
     print("Install with: pip install Flask Flask-Cors pyautogui")
     sys.exit(1)
 
+# Optional imports
+try:
+    from a2wsgi import WSGIMiddleware
+except ImportError:
+    WSGIMiddleware = None
+
+try:
+    import pyperclip  # Installed alongside pyautogui
+except ImportError:
+    pyperclip = None
+
+try:
+    from playwright.async_api import async_playwright, Error as PlaywrightError
+except ImportError:
+    async_playwright = None
+    PlaywrightError = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
 # Configure pyautogui safety features
 pyautogui.FAILSAFE = True  # Moving mouse to top-left corner stops automation
-pyautogui.PAUSE = 0.25  # Delay between pyautogui actions
+pyautogui.PAUSE = 0.05  # Delay between pyautogui actions
 
 # Initialize Flask app
 app = Flask(__name__, static_folder='.', static_url_path='')
 CORS(app)  # Enable CORS for cross-origin requests
 
+# Let browsers cache static assets (JS/CSS/images) for an hour
+app.config['SEND_FILE_MAX_AGE_DEFAULT'] = 3600
+
+
+class ORJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by orjson for request parsing and jsonify()"""
+    
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        option = orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=self.default, option=option).decode('utf-8')
+    
+    def loads(self, s: Any, **kwargs: Any) -> Any:
+        return orjson.loads(s)
+
+
+if orjson:
+    app.json = ORJSONProvider(app)
+
+# ASGI entry point for event-loop servers: uvicorn app:asgi_app
+# Requests run on a pool of worker threads, so status polls never queue behind slower calls
+asgi_app = WSGIMiddleware(app, workers=8) if WSGIMiddleware else None
+
+# Platform detected once at import
+SYSTEM = platform.system()
+
+# Chrome executable on Linux, resolved once from the known package names
+LINUX_CHROME = next(
+    (cmd for cmd in ('google-chrome', 'google-chrome-stable', 'chromium-browser', 'chromium')
+     if shutil.which(cmd)),
+    'google-chrome'
+) if SYSTEM == 'Linux' else None
+
+
+def _find_windows_chrome() -> Optional[str]:
+    """Locate chrome.exe through the App Paths registry key, then PATH"""
+    import winreg
+    
+    for root in (winreg.HKEY_LOCAL_MACHINE, winreg.HKEY_CURRENT_USER):
+        try:
+            with winreg.OpenKey(root, r'Software\Microsoft\Windows\CurrentVersion\App Paths\chrome.exe') as key:
+                path = winreg.QueryValue(key, None)
+        except OSError:
+            continue
+        if path and os.path.isfile(path):
+            return path
+    
+    return shutil.which('chrome')
+
+
+# Chrome executable on Windows; launching it directly avoids spawning cmd.exe
+WINDOWS_CHROME = _find_windows_chrome() if SYSTEM == 'Windows' else None
+
+# Commands that are cmd.exe builtins and must run through the shell on Windows
+WINDOWS_SHELL_BUILTINS = {'start', 'echo'}
+
+# Browser launch commands per platform
+BROWSER_COMMANDS = {
+    'Windows': {
+        'chrome': [WINDOWS_CHROME] if WINDOWS_CHROME else ['start', 'chrome'],
+        'edge': ['start', 'msedge'],
+        'firefox': ['start', 'firefox'],
+        'brave': ['start', 'brave'],
+        'opera': ['start', 'opera'],
+        'safari': ['echo', 'Safari not available on Windows']
+    },
+    'Darwin': {
+        'chrome': ['open', '-a', 'Google Chrome'],
+        'edge': ['open', '-a', 'Microsoft Edge'],
+        'firefox': ['open', '-a', 'Firefox'],
+        'brave': ['open', '-a', 'Brave Browser'],
+        'opera': ['open', '-a', 'Opera'],
+        'safari': ['open', '-a', 'Safari']
+    },
+    'Linux': {
+        'chrome': [LINUX_CHROME],
+        'firefox': ['firefox'],
+        'brave': ['brave-browser'],
+        'opera': ['opera'],
+        'edge': ['microsoft-edge']
+    }
+}
+
+# Fallback for browsers missing from the table above
+DEFAULT_BROWSER_COMMANDS = {
+    'Windows': ['start', 'chrome'],
+    'Darwin': ['open', '-a', 'Google Chrome'],
+    'Linux': ['xdg-open', 'http://google.com']
+}
+
+# Chrome launch command prefix; the --profile-directory flag is appended
+CHROME_PROFILE_COMMANDS = {
+    'Windows': [WINDOWS_CHROME] if WINDOWS_CHROME else ['start', 'chrome'],
+    'Darwin': ['open', '-a', 'Google Chrome', '--args'],
+    'Linux': [LINUX_CHROME]
+}
+
+# Commands for the current platform
+LAUNCH_COMMANDS = BROWSER_COMMANDS.get(SYSTEM, {})
+DEFAULT_LAUNCH_COMMAND = DEFAULT_BROWSER_COMMANDS.get(SYSTEM)
+CHROME_PROFILE_COMMAND = CHROME_PROFILE_COMMANDS.get(SYSTEM)
+
+# Automation modes: synthesized keystrokes or Chrome DevTools Protocol via Playwright
+AUTOMATION_MODES = ('keystroke', 'cdp')
+
+# Search URL used by CDP mode
+SEARCH_URL = 'https://www.google.com/search?q={}'
+
+# Playwright engine and release channel per browser (brave/opera use bundled Chromium)
+PLAYWRIGHT_ENGINES = {'firefox': 'firefox', 'safari': 'webkit'}
+PLAYWRIGHT_CHANNELS = {'chrome': 'chrome', 'edge': 'msedge'}
+
+# Dedicated user data directory for CDP mode. Chrome refuses remote debugging on
+# its default user data directory, so each selected profile is copied into its own
+# subdirectory here first, which also lets profiles run in separate browsers at once.
+CDP_USER_DATA_DIR = Path.home() / '.fruit-search-bot' / 'cdp-user-data'
+
+# Profile files that carry login state; only these are copied for CDP mode
+# (Cookies lives under Network/ in current Chrome, at the profile root in older ones)
+CDP_PROFILE_FILES = ('Preferences', 'Secure Preferences', 'Login Data', 'Cookies', 'Network')
+
+# Default number of tabs searching concurrently per profile in CDP mode
+DEFAULT_MAX_TABS = 4
+
+# Default number of profiles running concurrently in CDP mode
+DEFAULT_MAX_PROFILES = 4
+
+# How often CDP-mode waits check whether automation was stopped (seconds)
+STOP_POLL_INTERVAL = 0.1
+
 # Global thread-safe state management
 state_lock = threading.Lock()
 state = {
-    'is_running': False,
     'status': 'Ready to start...',
     'progress': 0.0,
     'current_search': '',
@@ -49,17 +215,77 @@ state = {
     'total': 0
 }
 
+# Set while automation runs; cleared to ask the worker to stop
+running_event = threading.Event()
+
+# Serializes reads and writes of persisted JSON files (Windows cannot replace a
+# file that is open for reading); kept separate from state_lock so disk I/O
+# never blocks status updates
+file_lock = threading.Lock()
+
+# Parsed persisted JSON files: filename -> (mtime_ns, data)
+file_cache = {}
+
+# Chrome profile directory names: 'Default' plus 'Profile 1', 'Profile 2', ...
+DEFAULT_PROFILE_DIR = 'Default'
+PROFILE_DIR_PREFIX = 'Profile '
+
+# Upper bound on parallel Preferences reads during a profile scan
+PREFS_READ_WORKERS = 8
+
+# JSON decode errors raised by the available parsers
+JSON_ERRORS = (json.JSONDecodeError,)
+if orjson:
+    JSON_ERRORS += (orjson.JSONDecodeError,)
+if ijson:
+    JSON_ERRORS += (ijson.JSONError,)
+
 # Storage for selected profiles
 selected_profiles_memory = []
+cdp_user_data_dir = CDP_USER_DATA_DIR
 worker_thread = None
 
 
+def read_json(path: Path) -> Any:
+    """Parse a JSON file, using orjson when available"""
+    if orjson:
+        return orjson.loads(path.read_bytes())
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def dump_json(data: Any) -> bytes:
+    """Serialize data as indented UTF-8 JSON, using orjson when available"""
+    if orjson:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2)
+    return json.dumps(data, indent=2).encode('utf-8')
+
+
+def read_json_subtree(path: Path, prefix: str) -> Any:
+    """
+    Extract a single subtree (e.g. 'profile.info_cache') from a JSON file.
+    With ijson the file is streamed and only the requested subtree is built;
+    otherwise the whole document is parsed. Returns None if the key is absent.
+    """
+    if ijson:
+        with open(path, 'rb') as f:
+            return next(ijson.items(f, prefix), None)
+    
+    node = read_json(path)
+    for key in prefix.split('.'):
+        if not isinstance(node, dict):
+            return None
+        node = node.get(key)
+    return node
+
+
 class ChromeProfileManager:
     """Manages Chrome profile discovery and information retrieval"""
     
     def __init__(self):
-        self.platform = platform.system()
+        self.platform = SYSTEM
         self.user_data_dir = self._find_chrome_user_data_dir()
+        self._profiles_cache = None  # (cache key, profiles, profile directories)
     
     def _find_chrome_user_data_dir(self) -> Optional[Path]:
         """Find Chrome user data directory based on platform"""
@@ -92,100 +318,177 @@ class ChromeProfileManager:
         
         return None
     
+    def refresh(self) -> None:
+        """Re-detect the user data directory and drop cached profiles"""
+        self.user_data_dir = self._find_chrome_user_data_dir()
+        self._profiles_cache = None
+    
+    def _cache_key(self) -> Optional[tuple]:
+        """
+        Build a cache key from the modification times of the user data
+        directory (profiles added/removed) and Local State (profiles renamed).
+        """
+        try:
+            dir_mtime = os.stat(self.user_data_dir).st_mtime_ns
+        except OSError:
+            return None
+        try:
+            local_state_mtime = os.stat(self.user_data_dir / 'Local State').st_mtime_ns
+        except OSError:
+            local_state_mtime = None
+        return (str(self.user_data_dir), dir_mtime, local_state_mtime)
+    
+    def _load_profiles(self) -> tuple:
+        """
+        Return (profiles, profile directories), rescanning only when
+        the user data directory or Local State has changed.
+        """
+        key = self._cache_key() if self.user_data_dir else None
+        if key is None:
+            print(f"Chrome user data directory not found: {self.user_data_dir}")
+            return [], frozenset()
+        
+        cached = self._profiles_cache
+        if cached and cached[0] == key:
+            return cached[1], cached[2]
+        
+        profiles = self._scan_profiles()
+        directories = frozenset(p['directory'] for p in profiles)
+        self._profiles_cache = (key, profiles, directories)
+        return profiles, directories
+    
     def get_available_profiles(self) -> List[Dict[str, str]]:
         """
         Get list of available Chrome profiles with friendly names.
+        Results are cached until the user data directory or Local State changes.
         Returns: List of dicts with 'name', 'directory', 'path' keys
         """
+        return list(self._load_profiles()[0])
+    
+    def get_profile_directories(self) -> frozenset:
+        """Get the directory names of available profiles, for membership checks"""
+        return self._load_profiles()[1]
+    
+    def _scan_profiles(self) -> List[Dict[str, str]]:
+        """Read profile directories and friendly names from disk"""
         profiles = []
         
-        if not self.user_data_dir or not self.user_data_dir.exists():
-            print(f"Chrome user data directory not found: {self.user_data_dir}")
-            return profiles
-        
         # Try to read Local State for profile info
         local_state_file = self.user_data_dir / 'Local State'
         profile_info_cache = {}
         
         if local_state_file.exists():
             try:
-                with open(local_state_file, 'r', encoding='utf-8') as f:
-                    local_state = json.load(f)
-                    profile_info_cache = local_state.get('profile', {}).get('info_cache', {})
-            except (json.JSONDecodeError, KeyError, IOError) as e:
+                profile_info_cache = read_json_subtree(local_state_file, 'profile.info_cache') or {}
+            except (*JSON_ERRORS, IOError) as e:
                 print(f"Warning: Could not read Local State: {e}")
         
-        # Scan for profile directories
-        profile_dirs = []
+        # Scan for Default, Profile 1, Profile 2, etc. in a single directory pass
+        with os.scandir(self.user_data_dir) as entries:
+            profile_dirs = [
+                entry.name for entry in entries
+                if entry.is_dir(follow_symlinks=False)
+                and (entry.name == DEFAULT_PROFILE_DIR or entry.name.startswith(PROFILE_DIR_PREFIX))
+            ]
         
-        # Always check for Default profile
-        default_dir = self.user_data_dir / 'Default'
-        if default_dir.exists() and default_dir.is_dir():
-            profile_dirs.append('Default')
+        # Keep the Default profile first
+        profile_dirs.sort(key=lambda d: d != DEFAULT_PROFILE_DIR)
         
-        # Look for Profile 1, Profile 2, etc.
-        for item in self.user_data_dir.iterdir():
-            if item.is_dir() and item.name.startswith('Profile '):
-                profile_dirs.append(item.name)
+        # Try to get friendly names from various sources
+        # 1. Try Local State info_cache (usually names every profile, so no further I/O)
+        if not isinstance(profile_info_cache, dict):
+            profile_info_cache = {}
+        names = {d: self._profile_name(profile_info_cache.get(d)) for d in profile_dirs}
+        
+        # 2. Try reading Preferences files, in parallel since each read is independent I/O
+        missing = [d for d in profile_dirs if not names[d]]
+        if missing:
+            prefs_files = [self.user_data_dir / d / 'Preferences' for d in missing]
+            with ThreadPoolExecutor(max_workers=min(PREFS_READ_WORKERS, len(missing))) as executor:
+                names.update(zip(missing, executor.map(self._read_preferences_name, prefs_files)))
         
         # Build profile information
         for profile_dir in profile_dirs:
-            profile_path = self.user_data_dir / profile_dir
-            
-            # Try to get friendly name from various sources
-            name = None
-            
-            # 1. Try Local State info_cache
-            if profile_dir in profile_info_cache:
-                cache_info = profile_info_cache[profile_dir]
-                if isinstance(cache_info, dict):
-                    name = cache_info.get('name', cache_info.get('gaia_name'))
-            
-            # 2. Try reading Preferences file
-            if not name:
-                prefs_file = profile_path / 'Preferences'
-                if prefs_file.exists():
-                    try:
-                        with open(prefs_file, 'r', encoding='utf-8') as f:
-                            prefs = json.load(f)
-                            profile_info = prefs.get('profile', {})
-                            name = profile_info.get('name') or profile_info.get('gaia_name')
-                    except (json.JSONDecodeError, IOError):
-                        pass
-            
-            # 3. Fallback to directory name
-            if not name:
-                name = profile_dir
-            
             profiles.append({
-                'name': name,
+                # 3. Fallback to directory name
+                'name': names[profile_dir] or profile_dir,
                 'directory': profile_dir,
-                'path': str(profile_path)
+                'path': str(self.user_data_dir / profile_dir)
             })
         
         return profiles
+    
+    @staticmethod
+    def _profile_name(profile_info: Any) -> Optional[str]:
+        """Pick the friendly name from a profile info dict"""
+        if isinstance(profile_info, dict):
+            return profile_info.get('name') or profile_info.get('gaia_name')
+        return None
+    
+    @classmethod
+    def _read_preferences_name(cls, prefs_file: Path) -> Optional[str]:
+        """
+        Read a profile's friendly name from its Preferences file.
+        Parsed in full: the 'profile' object holds content_settings, which is most
+        of the file, so streaming that subtree would cost more than a plain parse.
+        """
+        try:
+            prefs = read_json(prefs_file)
+        except (*JSON_ERRORS, IOError):
+            return None
+        return cls._profile_name(prefs.get('profile') if isinstance(prefs, dict) else None)
 
 
-def save_to_file(filename: str, data: Any) -> None:
-    """Thread-safe file saving"""
-    with state_lock:
+# Shared profile manager so repeated requests reuse the cached scan
+profile_manager = ChromeProfileManager()
+
+
+def save_to_file(filename: str, data: Any) -> bool:
+    """
+    Thread-safe file saving.
+    Writes to a temporary file and atomically replaces the target,
+    so readers never see a partially written file.
+    Returns True if the file was saved.
+    """
+    tmp_filename = f'{filename}.tmp.{os.getpid()}'
+    with file_lock:
         try:
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2)
+            Path(tmp_filename).write_bytes(dump_json(data))
+            os.replace(tmp_filename, filename)
+            file_cache.pop(filename, None)
+            return True
         except IOError as e:
             print(f"Error saving to {filename}: {e}")
+            try:
+                os.unlink(tmp_filename)
+            except OSError:
+                pass
+            return False
 
 
 def load_from_file(filename: str) -> Any:
-    """Thread-safe file loading"""
-    with state_lock:
+    """
+    Thread-safe file loading.
+    Parsed contents are cached until the file's modification time changes.
+    """
+    with file_lock:
+        try:
+            mtime = os.stat(filename).st_mtime_ns
+        except OSError:
+            return None
+        
+        cached = file_cache.get(filename)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        
         try:
-            if os.path.exists(filename):
-                with open(filename, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-        except (IOError, json.JSONDecodeError) as e:
+            data = read_json(Path(filename))
+        except (IOError, *JSON_ERRORS) as e:
             print(f"Error loading from {filename}: {e}")
-    return None
+            return None
+        
+        file_cache[filename] = (mtime, data)
+        return data
 
 
 def launch_browser(browser: str, profile_dir: Optional[str] = None) -> Optional[subprocess.Popen]:
@@ -193,83 +496,253 @@ def launch_browser(browser: str, profile_dir: Optional[str] = None) -> Optional[
     Launch browser with optional Chrome profile.
     Returns subprocess.Popen object or None if failed.
     """
-    system = platform.system()
+    if browser == 'chrome' and profile_dir:
+        base_cmd = CHROME_PROFILE_COMMAND
+        cmd = base_cmd + [f'--profile-directory={profile_dir}'] if base_cmd else None
+    else:
+        cmd = LAUNCH_COMMANDS.get(browser, DEFAULT_LAUNCH_COMMAND)
+    
+    if not cmd:
+        return None
     
     try:
-        if system == 'Windows':
-            if browser == 'chrome' and profile_dir:
-                # Windows Chrome with profile
-                cmd = ['start', 'chrome', f'--profile-directory={profile_dir}']
-                return subprocess.Popen(cmd, shell=True)
-            else:
-                # Other browsers on Windows
-                browser_commands = {
-                    'chrome': 'start chrome',
-                    'edge': 'start msedge',
-                    'firefox': 'start firefox',
-                    'brave': 'start brave',
-                    'opera': 'start opera',
-                    'safari': 'echo "Safari not available on Windows"'
-                }
-                cmd = browser_commands.get(browser, 'start chrome')
+        if SYSTEM == 'Windows':
+            if cmd[0] in WINDOWS_SHELL_BUILTINS:
                 return subprocess.Popen(cmd, shell=True)
-        
-        elif system == 'Darwin':  # macOS
-            if browser == 'chrome' and profile_dir:
-                # macOS Chrome with profile
-                cmd = ['open', '-a', 'Google Chrome', '--args', f'--profile-directory={profile_dir}']
-                return subprocess.Popen(cmd)
-            else:
-                # Other browsers on macOS
-                browser_apps = {
-                    'chrome': 'Google Chrome',
-                    'edge': 'Microsoft Edge',
-                    'firefox': 'Firefox',
-                    'brave': 'Brave Browser',
-                    'opera': 'Opera',
-                    'safari': 'Safari'
-                }
-                app_name = browser_apps.get(browser, 'Google Chrome')
-                cmd = ['open', '-a', app_name]
-                return subprocess.Popen(cmd)
-        
-        elif system == 'Linux':
-            if browser == 'chrome' and profile_dir:
-                # Try various Chrome executables on Linux
-                chrome_cmds = [
-                    'google-chrome',
-                    'google-chrome-stable',
-                    'chromium-browser',
-                    'chromium'
-                ]
-                for chrome_cmd in chrome_cmds:
-                    try:
-                        cmd = [chrome_cmd, f'--profile-directory={profile_dir}']
-                        return subprocess.Popen(cmd)
-                    except FileNotFoundError:
-                        continue
-            else:
-                # Other browsers on Linux
-                browser_commands = {
-                    'chrome': 'google-chrome',
-                    'firefox': 'firefox',
-                    'brave': 'brave-browser',
-                    'opera': 'opera',
-                    'edge': 'microsoft-edge'
-                }
-                cmd = browser_commands.get(browser, 'xdg-open http://google.com')
-                return subprocess.Popen(cmd.split())
-    
+            # Run the executable directly, detached from this console
+            return subprocess.Popen(cmd, creationflags=subprocess.DETACHED_PROCESS)
+        return subprocess.Popen(cmd)
     except Exception as e:
         print(f"Error launching browser: {e}")
     
     return None
 
 
-def automation_worker(fruits: List[str], delay: float, browser: str, profiles: List[Dict[str, str]]):
+def enter_text(text: str) -> None:
+    """
+    Enter text into the focused field.
+    Pastes via the clipboard when pyperclip is available (constant time
+    regardless of length), otherwise types it key by key.
+    """
+    if pyperclip:
+        try:
+            pyperclip.copy(text)
+            pyautogui.hotkey('ctrl', 'v')
+            return
+        except pyperclip.PyperclipException:
+            pass
+    pyautogui.typewrite(text, interval=0.05)
+
+
+def mark_search_started(fruit: str) -> None:
+    """Record the search currently in progress"""
+    status = f'Searching for: {fruit}'
+    with state_lock:
+        state.update(current_search=fruit, status=status)
+
+
+def mark_search_completed() -> None:
+    """Count a finished search and update progress"""
+    with state_lock:
+        completed = state['completed'] + 1
+        state.update(completed=completed, progress=(completed / state['total']) * 100)
+
+
+def search_delay(delay: float) -> float:
+    """Delay before the next search, with random jitter in [0.15, 0.6) seconds"""
+    return max(0.1, delay + 0.15 + random.random() * 0.45)
+
+
+def run_keystroke_searches(fruits: List[str], delay: float, browser: str, profile_dir: Optional[str]) -> None:
+    """Open the browser for one profile and search each fruit with pyautogui"""
+    # Launch browser with profile
+    launch_browser(browser, profile_dir)
+    
+    # Wait for browser to open and become active
+    time.sleep(3)
+    
+    # Perform searches for this profile
+    for fruit in fruits:
+        if not running_event.is_set():
+            break
+        
+        mark_search_started(fruit)
+        
+        # Focus address bar; each search replaces the current page in place,
+        # so no new tab (and new-tab page render) is needed per fruit
+        pyautogui.hotkey('ctrl', 'l')
+        time.sleep(0.3)
+        
+        # Enter search term
+        enter_text(fruit)
+        time.sleep(0.2)
+        
+        # Press Enter to search
+        pyautogui.press('enter')
+        
+        mark_search_completed()
+        time.sleep(search_delay(delay))
+
+
+def prepare_cdp_profile(profile_dir: str) -> Path:
+    """
+    Copy a Chrome profile's login state (and Local State, which holds the cookie
+    encryption key) into its own user data directory under the CDP directory,
+    refreshing any earlier copy.
+    Returns the profile's CDP user data directory.
+    """
+    source_dir = profile_manager.user_data_dir
+    cdp_dir = Path(cdp_user_data_dir)
+    
+    if not source_dir:
+        raise RuntimeError('Chrome user data directory not found')
+    # Only known profile directory names may become paths (no '..' or absolute paths)
+    if profile_dir not in profile_manager.get_profile_directories():
+        raise RuntimeError(f'Unknown Chrome profile directory: {profile_dir}')
+    if cdp_dir.resolve() == source_dir.resolve():
+        raise RuntimeError('CDP user data directory must not be Chrome\'s default user data directory')
+    
+    target_dir = cdp_dir / profile_dir
+    (target_dir / profile_dir).mkdir(parents=True, exist_ok=True)
+    
+    copies = [(source_dir / 'Local State', target_dir / 'Local State')]
+    copies += [(source_dir / profile_dir / name, target_dir / profile_dir / name) for name in CDP_PROFILE_FILES]
+    
+    for source, target in copies:
+        try:
+            if source.is_dir():
+                shutil.copytree(source, target, dirs_exist_ok=True)
+            elif source.exists():
+                shutil.copy2(source, target)
+        except (shutil.Error, OSError) as e:
+            # Files locked by a running Chrome are skipped; the rest of the profile is usable
+            print(f"Warning: Could not copy {source.name}: {e}")
+    
+    return target_dir
+
+
+async def launch_browser_context(playwright, browser: str, profile_dir: Optional[str]):
+    """
+    Launch a Playwright browser context.
+    Chrome profiles run from a copy in the dedicated CDP user data directory;
+    other browsers get a temporary one.
+    """
+    browser_type = getattr(playwright, PLAYWRIGHT_ENGINES.get(browser, 'chromium'))
+    options = {'headless': False}
+    
+    if PLAYWRIGHT_CHANNELS.get(browser):
+        options['channel'] = PLAYWRIGHT_CHANNELS[browser]
+    
+    user_data_dir = ''
+    if browser == 'chrome' and profile_dir:
+        user_data_dir = str(await asyncio.to_thread(prepare_cdp_profile, profile_dir))
+        options['args'] = [f'--profile-directory={profile_dir}']
+    
+    return await browser_type.launch_persistent_context(user_data_dir, **options)
+
+
+async def sleep_while_running(seconds: float) -> bool:
+    """
+    Sleep for up to the given seconds, waking early if automation is stopped.
+    Returns True if automation is still running afterwards.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + seconds
+    while running_event.is_set():
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            return True
+        await asyncio.sleep(min(remaining, STOP_POLL_INTERVAL))
+    return False
+
+
+async def run_cdp_searches(playwright, fruits: List[str], delay: float, browser: str,
+                           profile_dir: Optional[str], max_tabs: int = DEFAULT_MAX_TABS) -> None:
+    """
+    Search each fruit for one profile by navigating Playwright pages directly.
+    A pool of up to max_tabs pages is opened up front; each page takes the
+    next pending fruit until none are left. Searches still start at most once
+    per delay across all tabs; only the page loads overlap.
+    """
+    context = await launch_browser_context(playwright, browser, profile_dir)
+    try:
+        pages = list(context.pages[:1])
+        while len(pages) < max(1, min(max_tabs, len(fruits))):
+            pages.append(await context.new_page())
+        
+        # Shared by all tabs so each fruit is searched exactly once
+        pending = iter(fruits)
+        
+        # Shared rate limit so the delay applies between searches, not per tab
+        loop = asyncio.get_running_loop()
+        rate_lock = asyncio.Lock()
+        next_search_at = loop.time()
+        
+        async def search_in_tab(page):
+            nonlocal next_search_at
+            for fruit in pending:
+                if not running_event.is_set():
+                    break
+                
+                async with rate_lock:
+                    # Re-checks the stop flag before and while waiting for this tab's turn
+                    if not await sleep_while_running(next_search_at - loop.time()):
+                        break
+                    next_search_at = loop.time() + search_delay(delay)
+                
+                mark_search_started(fruit)
+                try:
+                    await page.goto(SEARCH_URL.format(quote_plus(fruit)))
+                except PlaywrightError as e:
+                    # One failed navigation (e.g. a timeout) should not end the run
+                    print(f"Search failed for {fruit}: {e}")
+                mark_search_completed()
+        
+        await asyncio.gather(*(search_in_tab(page) for page in pages))
+    finally:
+        await context.close()
+
+
+async def run_cdp_profiles(fruits: List[str], delay: float, browser: str, profiles: List[Dict[str, str]],
+                           max_tabs: int = DEFAULT_MAX_TABS, max_profiles: int = DEFAULT_MAX_PROFILES) -> None:
+    """
+    Run every profile's searches through Playwright, up to max_profiles browsers
+    at once. Each profile uses its own user data directory copy and paces its
+    own searches by the delay.
+    """
+    semaphore = asyncio.Semaphore(max_profiles)
+    active_profiles = []
+    
+    def update_active_profiles() -> None:
+        names = ', '.join(active_profiles)
+        with state_lock:
+            state.update(current_profile=names, status=f'Running profiles: {names}')
+    
+    async with async_playwright() as playwright:
+        async def run_profile(profile):
+            async with semaphore:
+                if not running_event.is_set():
+                    return
+                
+                active_profiles.append(profile['name'])
+                update_active_profiles()
+                try:
+                    await run_cdp_searches(playwright, fruits, delay, browser, profile.get('directory'), max_tabs)
+                finally:
+                    active_profiles.remove(profile['name'])
+        
+        await asyncio.gather(*(run_profile(profile) for profile in profiles))
+
+
+def automation_worker(fruits: List[str], delay: float, browser: str, profiles: List[Dict[str, str]],
+                      mode: str = 'keystroke', max_tabs: int = DEFAULT_MAX_TABS,
+                      max_profiles: int = DEFAULT_MAX_PROFILES):
     """
-    Worker thread that performs the automation using pyautogui.
-    Runs searches for each fruit in each selected profile.
+    Worker thread that performs the automation, either with pyautogui
+    keystrokes or through Playwright (mode='cdp').
+    Runs searches for each fruit in each selected profile. Keystroke mode runs
+    profiles one at a time; CDP mode runs up to max_profiles at once, each
+    searching in up to max_tabs tabs.
     """
     global state
     
@@ -278,82 +751,60 @@ def automation_worker(fruits: List[str], delay: float, browser: str, profiles: L
         profiles = [{'name': 'Default', 'directory': None, 'path': None}]
     
     total_searches = len(fruits) * len(profiles)
-    completed = 0
     
     with state_lock:
-        state['total'] = total_searches
-        state['completed'] = 0
-        state['progress'] = 0.0
+        state.update(total=total_searches, completed=0, progress=0.0)
+    
+    # Reason shown in the status when the run ends early
+    stop_reason = 'Automation stopped'
     
     try:
-        for profile in profiles:
-            if not state['is_running']:
-                break
-            
-            profile_name = profile['name']
-            profile_dir = profile.get('directory')
-            
-            # Update current profile
-            with state_lock:
-                state['current_profile'] = profile_name
-                state['status'] = f'Opening browser for profile: {profile_name}'
-            
-            # Launch browser with profile
-            launch_browser(browser, profile_dir)
-            
-            # Wait for browser to open and become active
-            time.sleep(3)
-            
-            # Perform searches for this profile
-            for fruit in fruits:
-                if not state['is_running']:
+        if mode == 'cdp':
+            asyncio.run(run_cdp_profiles(fruits, delay, browser, profiles, max_tabs, max_profiles))
+        else:
+            for profile in profiles:
+                if not running_event.is_set():
                     break
                 
-                # Update state
-                with state_lock:
-                    state['current_search'] = fruit
-                    state['status'] = f'Searching for: {fruit}'
-                
-                # Open new tab
-                pyautogui.hotkey('ctrl', 't')
-                time.sleep(0.5)
-                
-                # Focus address bar
-                pyautogui.hotkey('ctrl', 'l')
-                time.sleep(0.3)
+                profile_name = profile['name']
+                profile_dir = profile.get('directory')
                 
-                # Type search term
-                pyautogui.typewrite(fruit, interval=0.05)
-                time.sleep(0.2)
-                
-                # Press Enter to search
-                pyautogui.press('enter')
-                
-                # Update progress
-                completed += 1
+                # Update current profile
+                status = f'Opening browser for profile: {profile_name}'
                 with state_lock:
-                    state['completed'] = completed
-                    state['progress'] = (completed / total_searches) * 100
+                    state.update(current_profile=profile_name, status=status)
                 
-                # Wait with random jitter
-                sleep_time = max(0.1, delay + random.uniform(0.15, 0.6))
-                time.sleep(sleep_time)
+                run_keystroke_searches(fruits, delay, browser, profile_dir)
     
     except pyautogui.FailSafeException:
-        print("Automation stopped: Mouse moved to top-left corner (failsafe triggered)")
+        stop_reason = 'Automation stopped: Mouse moved to top-left corner (failsafe triggered)'
+        print(stop_reason)
     except Exception as e:
-        print(f"Automation error: {e}")
+        stop_reason = f'Automation error: {e}'
+        print(stop_reason)
     finally:
         # Clean up state
         with state_lock:
-            state['is_running'] = False
-            state['status'] = 'Automation completed' if completed == total_searches else 'Automation stopped'
+            running_event.clear()
+            state['status'] = 'Automation completed' if state['completed'] == total_searches else stop_reason
             state['current_search'] = ''
             state['current_profile'] = ''
 
 
 # Flask Routes
 
+@app.after_request
+def revalidate_index(response):
+    """Make browsers revalidate index.html (via its ETag) on every load"""
+    if request.path in ('/', '/index.html'):
+        response.cache_control.public = True
+        response.cache_control.max_age = 0
+        response.cache_control.must_revalidate = True
+        # send_static_file also sets Expires from the max age; drop it so it cannot override
+        response.headers.pop('Expires', None)
+    return response
+
+
 @app.route('/')
 def index():
     """Serve the main index.html file"""
@@ -363,16 +814,15 @@ def index():
 @app.route('/api/profiles', methods=['GET'])
 def get_profiles():
     """Get available Chrome profiles"""
-    manager = ChromeProfileManager()
-    profiles = manager.get_available_profiles()
+    profiles = profile_manager.get_available_profiles()
     return jsonify({'profiles': profiles})
 
 
 @app.route('/api/profiles/refresh', methods=['POST'])
 def refresh_profiles():
     """Force refresh of Chrome profiles"""
-    manager = ChromeProfileManager()
-    profiles = manager.get_available_profiles()
+    profile_manager.refresh()
+    profiles = profile_manager.get_available_profiles()
     return jsonify({'profiles': profiles})
 
 
@@ -384,10 +834,8 @@ def apply_profiles():
     data = request.json
     selected = data.get('selectedProfiles', [])
     
-    # Validate selected profiles against available profiles
-    manager = ChromeProfileManager()
-    available = manager.get_available_profiles()
-    available_dirs = {p['directory'] for p in available}
+    # Validate selected profiles against available profile directories
+    available_dirs = profile_manager.get_profile_directories()
     
     valid_profiles = []
     invalid_profiles = []
@@ -426,7 +874,8 @@ def save_fruits():
     data = request.json
     fruits = data.get('fruits', [])
     
-    save_to_file('fruits.json', fruits)
+    if not save_to_file('fruits.json', fruits):
+        return jsonify({'error': 'Could not save fruits to file'}), 500
     
     return jsonify({'message': f'Saved {len(fruits)} fruits'})
 
@@ -448,7 +897,7 @@ def start_automation():
     global state, worker_thread, selected_profiles_memory
     
     # Check if already running
-    if state['is_running']:
+    if running_event.is_set():
         return jsonify({'error': 'Automation is already running'}), 400
     
     data = request.json
@@ -457,11 +906,25 @@ def start_automation():
     browser = data.get('browser', 'chrome')
     request_profiles = data.get('selectedProfiles', [])
     use_default = data.get('useDefaultIfNoProfile', False)
+    mode = data.get('mode', 'keystroke')
+    max_tabs = data.get('maxTabs', DEFAULT_MAX_TABS)
+    max_profiles = data.get('maxProfiles', DEFAULT_MAX_PROFILES)
     
     # Validate inputs
     if not fruits:
         return jsonify({'error': 'No fruits provided'}), 400
     
+    if mode not in AUTOMATION_MODES:
+        return jsonify({'error': f'Unknown mode: {mode}. Use one of: {", ".join(AUTOMATION_MODES)}'}), 400
+    
+    if mode == 'cdp' and async_playwright is None:
+        return jsonify({'error': 'CDP mode requires Playwright: pip install playwright'}), 400
+    
+    for field, value in (('maxTabs', max_tabs), ('maxProfiles', max_profiles)):
+        # bool is an int subclass, so reject it explicitly
+        if isinstance(value, bool) or not isinstance(value, int) or value < 1:
+            return jsonify({'error': f'{field} must be a positive integer'}), 400
+    
     if delay < 0.5:
         delay = 3.0
         warning = 'Delay was below minimum (0.5s), set to 3.0s'
@@ -478,9 +941,8 @@ def start_automation():
         elif selected_profiles_memory:
             profiles_to_use = selected_profiles_memory
         elif use_default:
-            manager = ChromeProfileManager()
-            available = manager.get_available_profiles()
-            default = next((p for p in available if p['directory'] == 'Default'), None)
+            available = profile_manager.get_available_profiles()
+            default = next((p for p in available if p['directory'] == DEFAULT_PROFILE_DIR), None)
             if default:
                 profiles_to_use = [default]
         
@@ -488,12 +950,12 @@ def start_automation():
             return jsonify({'error': 'No Chrome profiles selected. Provide selectedProfiles in request body or call /api/apply-profiles first.'}), 400
     
     # Check for GUI availability (basic check)
-    if platform.system() == 'Linux' and not os.environ.get('DISPLAY'):
+    if SYSTEM == 'Linux' and not os.environ.get('DISPLAY'):
         warning = 'Warning: No display detected. Automation may fail on headless systems.'
     
     # Update state and start worker
     with state_lock:
-        state['is_running'] = True
+        running_event.set()
         state['status'] = 'Starting automation...'
         state['progress'] = 0
         state['completed'] = 0
@@ -502,7 +964,7 @@ def start_automation():
     # Start worker thread
     worker_thread = threading.Thread(
         target=automation_worker,
-        args=(fruits, delay, browser, profiles_to_use),
+        args=(fruits, delay, browser, profiles_to_use, mode, max_tabs, max_profiles),
         daemon=True
     )
     worker_thread.start()
@@ -527,8 +989,8 @@ def stop_automation():
     global state
     
     with state_lock:
-        if state['is_running']:
-            state['is_running'] = False
+        if running_event.is_set():
+            running_event.clear()
             state['status'] = 'Stopping automation...'
     
     return jsonify({'message': 'Stopping'})
@@ -537,33 +999,36 @@ def stop_automation():
 @app.route('/api/status', methods=['GET'])
 def get_status():
     """Get current automation status"""
+    # Copy under the lock, serialize outside it
     with state_lock:
-        return jsonify({
-            'is_running': state['is_running'],
-            'status': state['status'],
-            'current_search': state['current_search'],
-            'current_profile': state['current_profile'],
-            'progress': round(state['progress'], 1),
-            'completed': state['completed'],
-            'total': state['total']
-        })
+        snapshot = state.copy()
+    
+    return jsonify({
+        'is_running': running_event.is_set(),
+        'status': snapshot['status'],
+        'current_search': snapshot['current_search'],
+        'current_profile': snapshot['current_profile'],
+        'progress': round(snapshot['progress'], 1),
+        'completed': snapshot['completed'],
+        'total': snapshot['total']
+    })
 
 
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint with system info"""
-    manager = ChromeProfileManager()
-    
     return jsonify({
         'status': 'healthy',
-        'platform': platform.system(),
-        'chrome_dir': str(manager.user_data_dir) if manager.user_data_dir else 'Not found',
+        'platform': SYSTEM,
+        'chrome_dir': str(profile_manager.user_data_dir) if profile_manager.user_data_dir else 'Not found',
         'pyautogui_available': True,
+        'playwright_available': async_playwright is not None,
         'failsafe_enabled': pyautogui.FAILSAFE
     })
 
 
-def search_from_file(filename='fruits.json', delay=3, browser='chrome', profile_names=None):
+def search_from_file(filename='fruits.json', delay=3, browser='chrome', profile_names=None, mode='keystroke',
+                     max_tabs=DEFAULT_MAX_TABS, max_profiles=DEFAULT_MAX_PROFILES):
     """
     CLI function to run automation from a file.
     Args:
@@ -571,6 +1036,9 @@ def search_from_file(filename='fruits.json', delay=3, browser='chrome', profile_
         delay: Delay between searches in seconds
         browser: Browser to use (chrome, edge, firefox, etc.)
         profile_names: List of Chrome profile names to use (optional)
+        mode: 'keystroke' (pyautogui) or 'cdp' (Playwright)
+        max_tabs: Concurrent tabs per profile in CDP mode
+        max_profiles: Concurrent profiles in CDP mode
     """
     # Load fruits from file
     fruits = load_from_file(filename)
@@ -583,8 +1051,7 @@ def search_from_file(filename='fruits.json', delay=3, browser='chrome', profile_
     # Get profiles if Chrome
     profiles = []
     if browser == 'chrome' and profile_names:
-        manager = ChromeProfileManager()
-        available = manager.get_available_profiles()
+        available = profile_manager.get_available_profiles()
         
         for name in profile_names:
             profile = next((p for p in available if p['name'] == name), None)
@@ -595,10 +1062,41 @@ def search_from_file(filename='fruits.json', delay=3, browser='chrome', profile_
     
     # Run automation
     print(f"Starting automation with {browser}...")
-    automation_worker(fruits, delay, browser, profiles)
+    running_event.set()
+    automation_worker(fruits, delay, browser, profiles, mode, max_tabs, max_profiles)
     print("Automation completed")
 
 
+def run_uvicorn(port: int, debug: bool = False) -> None:
+    """
+    Serve the app through Uvicorn's event loop via the ASGI adapter,
+    which dispatches requests to a thread pool.
+    A single worker process is used because automation state lives in memory;
+    the pyautogui worker keeps running on its own background thread.
+    """
+    try:
+        import uvicorn
+    except ImportError:
+        uvicorn = None
+    
+    if uvicorn is None or asgi_app is None:
+        print("Uvicorn serving requires: pip install a2wsgi uvicorn")
+        sys.exit(1)
+    
+    uvicorn.run(asgi_app, host='0.0.0.0', port=port, log_level='debug' if debug else 'info')
+
+
+def run_waitress(port: int) -> None:
+    """Serve the app with Waitress' multi-threaded WSGI server"""
+    try:
+        from waitress import serve
+    except ImportError:
+        print("Waitress serving requires: pip install waitress")
+        sys.exit(1)
+    
+    serve(app, host='0.0.0.0', port=port, threads=8)
+
+
 def main():
     """Main entry point with CLI support"""
     parser = argparse.ArgumentParser(description='Fruit Search Bot')
@@ -607,14 +1105,28 @@ def main():
     parser.add_argument('--delay', type=float, default=3.0, help='Delay between searches')
     parser.add_argument('--browser', default='chrome', help='Browser to use')
     parser.add_argument('--profiles', nargs='*', help='Chrome profile names (CLI mode)')
+    parser.add_argument('--mode', choices=AUTOMATION_MODES, default='keystroke',
+                        help='Automation mode: pyautogui keystrokes or Playwright/CDP (CLI mode)')
+    parser.add_argument('--cdp-user-data-dir', type=Path, default=CDP_USER_DATA_DIR,
+                        help='Dedicated Chrome user data directory that CDP mode copies profiles into')
+    parser.add_argument('--max-tabs', type=int, default=DEFAULT_MAX_TABS,
+                        help='Concurrent tabs per profile in CDP mode (CLI mode)')
+    parser.add_argument('--max-profiles', type=int, default=DEFAULT_MAX_PROFILES,
+                        help='Concurrent profiles in CDP mode (CLI mode)')
     parser.add_argument('--port', type=int, default=5000, help='Flask port')
     parser.add_argument('--debug', action='store_true', help='Debug mode')
+    parser.add_argument('--server', choices=['flask', 'waitress', 'uvicorn'], default='flask',
+                        help='HTTP server to run the web UI with')
     
     args = parser.parse_args()
     
+    global cdp_user_data_dir
+    cdp_user_data_dir = args.cdp_user_data_dir
+    
     if args.cli:
         # Run in CLI mode
-        search_from_file(args.file, args.delay, args.browser, args.profiles)
+        search_from_file(args.file, args.delay, args.browser, args.profiles, args.mode,
+                         args.max_tabs, args.max_profiles)
     else:
         # Load persisted profiles on startup
         global selected_profiles_memory
@@ -624,10 +1136,18 @@ def main():
             print(f"Loaded {len(persisted)} persisted profiles")
         
         # Run Flask server
-        print(f"Starting Flask server on port {args.port}...")
+        server_name = args.server.capitalize()
+        print(f"Starting {server_name} server on port {args.port}...")
         print(f"Open http://localhost:{args.port} in your browser")
         print("Safety: Move mouse to TOP-LEFT corner to stop automation")
-        app.run(host='0.0.0.0', port=args.port, debug=args.debug)
+        
+        if args.server == 'uvicorn':
+            run_uvicorn(args.port, args.debug)
+        elif args.server == 'waitress':
+            run_waitress(args.port)
+        else:
+            # Threaded so status polls never queue behind profile scans
+            app.run(host='0.0.0.0', port=args.port, debug=args.debug, threaded=True)
 
 
 if __name__ == '__main__':